@@ -13,14 +13,38 @@ import numpy as np
 import matplotlib.pyplot as plt
 import astropy.io.fits as pyfits
 from astropy.wcs import WCS
-from decomprofile.tools.measure_tools import measure_bkg
-from decomprofile.tools.cutout_tools import cut_center_auto, cutout
-from copy import deepcopy
+from decomprofile.tools.measure_tools import (measure_bkg, fit_data_oneD_gaussian, esti_bgkstd, detect_obj, mask_obj,
+                                               search_local_max, measure_FWHM, profiles_compare)
+from decomprofile.tools.cutout_tools import cut_center_auto, cutout, plot_overview
 from matplotlib.colors import LogNorm
 from decomprofile.tools.astro_tools import plt_fits, read_pixel_scale
 
-import sys
 from packaging import version
+from concurrent.futures import ThreadPoolExecutor
+
+def _parse_ids(select_idx, num):
+    """
+    Read the ids typed by the user, e.g., '0 2 12' or '0,2,12' -> [0, 2, 12].
+    Tokens that are not an id in range(num) are skipped with a warning.
+    """
+    ids = []
+    for tok in str(select_idx).replace(',', ' ').split():
+        if tok.isdecimal() and int(tok) < num:
+            ids.append(int(tok))
+        else:
+            print("WARNING: '{0}' is not a valid id, ignored.".format(tok))
+    return ids
+
+def _cast_stamp(stamp, dtype, name):
+    """
+    Cast a stamp to dtype if its values fit in it comfortably, otherwise keep it and print a warning.
+    """
+    if dtype is None:
+        return stamp
+    if np.nanmax(np.abs(stamp)) < np.finfo(dtype).max/10:
+        return stamp.astype(dtype, copy=False)
+    print("WARNING: the {0} is not cast to {1}, its values are out of range.".format(name, np.dtype(dtype).name))
+    return stamp
 
 class DataProcess(object):
     """
@@ -32,7 +56,8 @@ class DataProcess(object):
         - measure the target surface brightness profile, PSF FWHM, background.
     """
     def __init__(self, fov_image=None, target_pos = None, pos_type = 'pixel', header=None, exptime = None, fov_noise_map = None,
-                 rm_bkglight = False, if_plot = False, zp = None, **kwargs):
+                 rm_bkglight = False, if_plot = False, zp = None, fov_image_path = None, fov_image_ext = 0,
+                 dtype = None, **kwargs):
         """
         Parameter
         --------
@@ -52,29 +77,46 @@ class DataProcess(object):
             exptime: float or 2D array
             The exposure time of the data in (s) a the exptime_map
             
+            fov_image_path: string
+            The fits file of the field of view image, only used when fov_image is None.
+            The pixel data is memory mapped, so the cutouts in generate_target_materials only read their regions from the disk.
+            Note that find_PSF (without PSF_pos_list) and rm_bkglight = True still read the whole image.
+            
+            fov_image_ext: int or string
+            The HDU extension in fov_image_path that hosts the image. If header is None, its header is used.
+            
+            dtype: None or float dtype, e.g., np.float32
+            If given, the target stamp and noise map are stored in this dtype. None keeps the dtype of the data.
+            
         """
+        if fov_image is None and fov_image_path is not None:
+            with pyfits.open(fov_image_path, memmap=True) as hdul:  #The memory map stays valid after the file is closed.
+                fov_image = hdul[fov_image_ext].data
+                if header is None:
+                    header = hdul[fov_image_ext].header
+        self.header = header
         if target_pos is not None:
             if pos_type == 'pixel':
                 self.target_pos = target_pos
             elif pos_type == 'wcs':
-                wcs = WCS(header)
-                self.target_pos = wcs.all_world2pix([[target_pos[0], target_pos[1]]], 1)[0]
+                self.target_pos = self.wcs.all_world2pix([[target_pos[0], target_pos[1]]], 0)[0]  #origin 0 gives numpy (0-based) pixel indices.
             else:
                 raise ValueError("'pos_type' is should be either 'pixel' or 'wcs'.")
-            self.target_pos = np.int0(self.target_pos)
+            self.target_pos = np.rint(np.asarray(self.target_pos)).astype(np.intp)
         else:
             raise ValueError("'target_pos' must be assigned.")
 
         self.exptime = exptime
         self.if_plot = if_plot    
-        self.header = header
+        self._exptime_header = None
         if header is not None:
-            self.deltaPix = read_pixel_scale(header)
+            self._exptime_header = header.get('EXPTIME', None)
+            self.deltaPix = read_pixel_scale(self.wcs)
             if self.deltaPix == 3600.:
                 print("WARNING: pixel size could not read from the header! ")
         if fov_image is not None and rm_bkglight == True:
             bkglight = measure_bkg(fov_image, if_plot=if_plot, **kwargs)
-            fov_image = fov_image-bkglight
+            fov_image = np.subtract(fov_image, bkglight, out=bkglight)  #Reuse the background buffer, the input image is left untouched.
         self.fov_image = fov_image
         self.fov_noise_map = fov_noise_map
         
@@ -84,6 +126,16 @@ class DataProcess(object):
             self.zp = 27.0
         else:
             self.zp = zp
+        self.dtype = dtype
+
+    @property
+    def wcs(self):
+        """
+        The WCS of the header, built at the first use and then reused.
+        """
+        if not hasattr(self, '_wcs'):
+            self._wcs = WCS(self.header)
+        return self._wcs
 
     def generate_target_materials(self, cut_kernel = None,  radius=None, radius_list = None,
                                   bkg_std = None, create_mask = False, if_plot=None, **kwargs):
@@ -94,6 +146,10 @@ class DataProcess(object):
         --------
             radius: int or float
             The radius of aperture to cutout the target
+            
+            radius_list: list of int/float
+            The radii to test when radius is None, the first one with a clean background edge is used.
+            
             cut_kernel: None or 'center_gaussian' or 'center_bright'
                 if is None, directly cut.
                 if is 'center_gaussian', fit central as Gaussian to cut the Gaussian center.
@@ -107,10 +163,22 @@ class DataProcess(object):
         if radius == None:
             if radius_list == None:
                 radius_list = [30, 35, 40, 45, 50, 60, 70]
+            #Cut the largest stamp once, the smaller ones are its central views.
+            max_rad = max(radius_list)
+            _cut_data_max = cutout(image = self.fov_image, center = self.target_pos, radius=max_rad)
             for rad in radius_list:
-                from decomprofile.tools.measure_tools import fit_data_oneD_gaussian
-                _cut_data = cutout(image = self.fov_image, center = self.target_pos, radius=rad)
-                edge_data = np.concatenate([_cut_data[0,:],_cut_data[-1,:],_cut_data[:,0], _cut_data[:,-1]])
+                s = max_rad - rad
+                if s == int(s):
+                    s = int(s)
+                    _cut_data = _cut_data_max[s:len(_cut_data_max)-s, s:len(_cut_data_max)-s]
+                else:  #A non-integral step does not map to a central view.
+                    _cut_data = cutout(image = self.fov_image, center = self.target_pos, radius=rad)
+                frm = len(_cut_data)
+                edge_data = np.empty(4*frm, dtype=_cut_data.dtype)
+                edge_data[:frm] = _cut_data[0,:]
+                edge_data[frm:2*frm] = _cut_data[-1,:]
+                edge_data[2*frm:3*frm] = _cut_data[:,0]
+                edge_data[3*frm:] = _cut_data[:,-1]
                 gauss_mean, gauss_1sig = fit_data_oneD_gaussian(edge_data, ifplot=False)
                 up_limit = gauss_mean + 2 * gauss_1sig
                 percent = np.sum(edge_data>up_limit)/float(len(edge_data))
@@ -126,41 +194,52 @@ class DataProcess(object):
                                               return_center=True, if_plot=if_plot)
         else:
             target_stamp = cutout(image = self.fov_image, center = self.target_pos, radius=radius)
+        target_stamp = _cast_stamp(target_stamp, self.dtype, 'target stamp')
         
         if self.fov_noise_map is not None:
             self.noise_map = cutout(image = self.fov_noise_map, center = self.target_pos, radius=radius)
+            self.noise_map = _cast_stamp(self.noise_map, self.dtype, 'noise map')
         else:
             if bkg_std == None:
-                from decomprofile.tools.measure_tools import esti_bgkstd
                 target_2xlarger_stamp = cutout(image=self.fov_image, center= self.target_pos, radius=radius*2)
                 self.bkg_std = esti_bgkstd(target_2xlarger_stamp, if_plot=if_plot)
-            exptime = deepcopy(self.exptime)
+            else:
+                self.bkg_std = bkg_std
+            exptime = self.exptime
             if exptime is None:
-                if 'EXPTIME' in self.header.keys():
-                    exptime = self.header['EXPTIME']
+                if self._exptime_header is not None:
+                    exptime = self._exptime_header
                 else:
                     raise ValueError("No Exposure time information in the header, should input a value.")
             if isinstance(exptime, np.ndarray):
                 exptime_stamp = cutout(image=self.exptime, center= self.target_pos, radius=radius)
-            noise_map = np.sqrt(abs(target_stamp/exptime_stamp) + self.bkg_std**2)
+            else:
+                exptime_stamp = exptime
+            #Compute sqrt(|stamp/exptime| + bkg_std**2) in one buffer to avoid the full-size temporaries.
+            noise_dtype = np.result_type(target_stamp, exptime_stamp)
+            if self.dtype is not None and target_stamp.dtype == self.dtype:
+                noise_dtype = self.dtype
+            elif not np.issubdtype(noise_dtype, np.floating):
+                noise_dtype = float
+            noise_map = np.empty(target_stamp.shape, dtype=noise_dtype)
+            np.divide(target_stamp, exptime_stamp, out=noise_map)
+            np.abs(noise_map, out=noise_map)
+            noise_map += self.bkg_std**2
+            np.sqrt(noise_map, out=noise_map)
             self.noise_map = noise_map
         
-        target_mask = np.ones_like(target_stamp)
-        from decomprofile.tools.measure_tools import detect_obj, mask_obj
+        target_mask = np.ones(target_stamp.shape, dtype=bool)
         apertures = detect_obj(target_stamp, if_plot=create_mask, **kwargs)
         if create_mask == True:
-            select_idx = str(input('Input directly the a obj idx to mask, use space between each id:\n'))
-            if sys.version_info.major > 2:
-                select_idx = [int(select_idx[i]) for i in range(len(select_idx)) if select_idx[i].isnumeric()]
-            else:
-                select_idx = [int(select_idx[i]) for i in range(len(select_idx)) if select_idx[i].isdigit()]
+            select_idx = _parse_ids(input('Input directly the a obj idx to mask, use space between each id:\n'), len(apertures))
             apertures_ = [apertures[i] for i in select_idx]
             apertures = [apertures[i] for i in range(len(apertures)) if i not in select_idx]
             mask_list = mask_obj(target_stamp, apertures_, if_plot=False)
-            for i in range(len(mask_list)):
-                target_mask *= mask_list[i]
+            if mask_list != []:
+                target_mask = np.logical_and.reduce(mask_list)
         self.apertures = apertures
         self.target_stamp = target_stamp
+        self.target_flux = float(target_stamp.sum())
         self.target_mask = target_mask
         if if_plot:
             fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(14, 10))
@@ -172,60 +251,64 @@ class DataProcess(object):
             ax3.set_title('data * mask')
             plt.show()  
     
-    def find_PSF(self, radius = 50, PSF_pos_list = None, pos_type = 'pixel', user_option= False):
+    def find_PSF(self, radius = 50, PSF_pos_list = None, pos_type = 'pixel', user_option= False, threads = 1):
         """
         The purpose of this def
         
         Parameter
         --------
             radius: int/float
-            The radius of the cutout frames of the PSF. i.e., size = 2*radius + 1
+            The radius of the cutout frames of the PSF. i.e., size = 2*radius + 1, a float is rounded to the nearest int.
             
             user_option: bool
             only meaningful when PSF_pos_list = None. 
             
+            threads: int
+            The number of threads used to cut and measure the PSF candidates, only meaningful when PSF_pos_list = None.
+            
         Return
         --------
             A sth sth
         """
+        radius = int(round(radius))
         if PSF_pos_list is None:
-            from decomprofile.tools.measure_tools import search_local_max, measure_FWHM
-            init_PSF_locs_ = search_local_max(self.fov_image)
-            init_PSF_locs, FWHMs, fluxs = [], [], []
-            for i in range(len(init_PSF_locs_)):
-                cut_image = cut_center_auto(self.fov_image, center = init_PSF_locs_[i],
+            init_PSF_locs_ = np.array(search_local_max(self.fov_image))
+            stamps = np.empty((len(init_PSF_locs_), 2*radius+1, 2*radius+1), dtype=self.fov_image.dtype)
+            fwhm_mat = np.empty((len(init_PSF_locs_), 4))
+            def _measure_candidate(i):  #Each call only writes its own row, so the candidates can run in threads.
+                stamps[i] = cut_center_auto(self.fov_image, center = init_PSF_locs_[i],
                                             radius=radius)
-                _fwhms = measure_FWHM(cut_image , radius = int(radius/5))
-                if np.std(_fwhms)/np.mean(_fwhms) < 0.1 :  #Remove the deteced "PSFs" at the edge.
-                    init_PSF_locs.append(init_PSF_locs_[i])
-                    FWHMs.append(np.mean(_fwhms))
-                    fluxs.append(np.sum(cut_image))
-            init_PSF_locs = np.array(init_PSF_locs)
-            FWHMs = np.array(FWHMs)
-            fluxs = np.array(fluxs)
+                fwhm_mat[i] = measure_FWHM(stamps[i], radius = int(radius/5))
+            if threads == 1:
+                for i in range(len(init_PSF_locs_)):
+                    _measure_candidate(i)
+            else:
+                with ThreadPoolExecutor(max_workers=threads) as executor:
+                    list(executor.map(_measure_candidate, range(len(init_PSF_locs_))))
+            fluxs = stamps.sum(axis=(1,2))
+            good = fwhm_mat.std(axis=1)/fwhm_mat.mean(axis=1) < 0.1  #Remove the deteced "PSFs" at the edge.
+            init_PSF_locs = init_PSF_locs_[good]
+            stamps, fwhm_mat = stamps[good], fwhm_mat[good]
+            FWHMs = fwhm_mat.mean(axis=1)
+            fluxs = fluxs[good]
             if hasattr(self, 'target_stamp'):
-                target_flux = np.sum(self.target_stamp)
+                target_flux = getattr(self, 'target_flux', None)
+                if target_flux is None:
+                    target_flux = np.sum(self.target_stamp)
                 select_bool = (FWHMs<np.median(FWHMs)*1.5)*(fluxs<target_flux*10)*(fluxs>target_flux/2)
             else:
                 select_bool = (FWHMs<np.median(FWHMs)*1.5)
             PSF_locs = init_PSF_locs[select_bool]    
+            stamps, fwhm_mat = stamps[select_bool], fwhm_mat[select_bool]
             FWHMs = FWHMs[select_bool]
             fluxs = fluxs[select_bool]
             if user_option == True:
                 for i in range(len(PSF_locs)):
-                    cut_image = cut_center_auto(self.fov_image, center = PSF_locs[i],
-                                                kernel = 'center_gaussian', radius=radius)
                     print('PSF location:', PSF_locs[i])
-                    print('id:', i, 'FWHMs:', 
-                          np.round(measure_FWHM(cut_image ,radius = int(radius/5)),3),
-                          'flux:', round(np.sum(cut_image),1) )
-                    plt_fits(cut_image)
-                select_idx = str(input('Input directly the a obj idx to mask, use space between each id:\n'))
-                select_idx = select_idx.split(" ")
-                if sys.version_info.major > 2:
-                    select_idx = [int(select_idx[i]) for i in range(len(select_idx)) if select_idx[i].isnumeric()]
-                else:
-                    select_idx = [int(select_idx[i]) for i in range(len(select_idx)) if select_idx[i].isdigit()]                    
+                    print('id:', i, 'FWHMs:', np.round(fwhm_mat[i],3),
+                          'flux:', round(fluxs[i],1) )
+                    plt_fits(stamps[i])
+                select_idx = _parse_ids(input('Input directly the a obj idx to mask, use space between each id:\n'), len(PSF_locs))
                 self.PSF_pos_list = [PSF_locs[i] for i in select_idx]
             else:
                 select_idx = [np.where(FWHMs == FWHMs.min())[0][0] ]
@@ -234,17 +317,21 @@ class DataProcess(object):
             if pos_type == 'pixel':
                 self.PSF_pos_list = PSF_pos_list
             elif pos_type == 'wcs':
-                wcs = WCS(self.header)
-                self.PSF_pos_list = [wcs.all_world2pix([[PSF_pos_list[i][0], PSF_pos_list[i][1]]], 1) for i in range(len(self.PSF_pos_list))]
-        self.PSF_list = [cut_center_auto(self.fov_image, center = self.PSF_pos_list[i],
-                                          kernel = 'center_gaussian', radius=radius) for i in range(len(self.PSF_pos_list))]
+                self.PSF_pos_list = list(self.wcs.all_world2pix(np.asarray(PSF_pos_list, dtype=np.float64), 0))
+            self.PSF_pos_list = [np.rint(np.asarray(pos)).astype(np.intp) for pos in self.PSF_pos_list]
+        PSF_list = [cut_center_auto(self.fov_image, center = self.PSF_pos_list[i],
+                                    kernel = 'center_gaussian', radius=radius) for i in range(len(self.PSF_pos_list))]
+        if len(set([psf.shape for psf in PSF_list])) == 1:  #Hold the PSFs in one contiguous array, PSF_list are views of it.
+            self.PSF_stack = np.stack(PSF_list)
+            PSF_list = list(self.PSF_stack)
+        else:
+            self.PSF_stack = None
+        self.PSF_list = PSF_list
 
     def profiles_compare(self, **kargs):
-        from decomprofile.tools.measure_tools import profiles_compare    
         profiles_compare([self.target_stamp] + self.PSF_list, **kargs)
         
     def plot_overview(self, **kargs):
-        from decomprofile.tools.cutout_tools import plot_overview
         if hasattr(self, 'PSF_pos_list'):
             PSF_pos_list = self.PSF_pos_list
         else:
@@ -255,16 +342,17 @@ class DataProcess(object):
     def checkout(self):
         checklist = ['deltaPix', 'target_stamp', 'noise_map',  'target_mask', 'PSF_list', 'psf_id_for_fitting']
         ct = 0
-        if len(self.PSF_list[self.psf_id_for_fitting]) != 0 and self.PSF_list[self.psf_id_for_fitting].shape[0] != self.PSF_list[self.psf_id_for_fitting].shape[1]:
-            print("The PSF is not a box size, will cut it to a box size automatically.")
-            cut = int((self.PSF_list[self.psf_id_for_fitting].shape[0] - self.PSF_list[self.psf_id_for_fitting].shape[1])/2)
-            if cut>0:
-                self.PSF_list[self.psf_id_for_fitting] = self.PSF_list[self.psf_id_for_fitting][cut:-cut,:]
-            elif cut<0:
-                self.PSF_list[self.psf_id_for_fitting] = self.PSF_list[self.psf_id_for_fitting][:,-cut:cut]
-            self.PSF_list[self.psf_id_for_fitting] /= self.PSF_list[self.psf_id_for_fitting].sum()
-            if self.PSF_list[self.psf_id_for_fitting].shape[0] != self.PSF_list[self.psf_id_for_fitting].shape[1]:
-                raise ValueError("PSF shape is not a square.")
+        psf = self.PSF_list[self.psf_id_for_fitting]
+        if len(psf) != 0 and psf.shape[0] != psf.shape[1]:
+            print("The PSF is not a box size, will pad it to a box size automatically.")
+            h, w = psf.shape
+            size = max(h, w) + 1 - max(h, w)%2  #The box size should be odd.
+            y0, x0 = (size-h)//2, (size-w)//2
+            box_psf = np.zeros((size, size), dtype=np.result_type(psf, float))
+            box_psf[y0:y0+h, x0:x0+w] = psf
+            box_psf /= box_psf.sum()
+            self.PSF_list[self.psf_id_for_fitting] = box_psf
+            self.PSF_stack = None  #The padded PSF no longer fits the stack, so PSF_list is the only copy.
         for name in checklist:
             if not hasattr(self, name):
                 print('The keyword of {0} is missing.'.format(name))
@@ -78,7 +78,7 @@ class FittingSpeficy(object):
        
     def sepc_kwargs_likelihood(self, condition=None):
         kwargs_likelihood = {'check_bounds': True,  #Set the bonds, if exceed, reutrn "penalty"
-                             'image_likelihood_mask_list': [self.data_process_class.target_mask],
+                             'image_likelihood_mask_list': [np.asarray(self.data_process_class.target_mask, dtype=float)],
                              'custom_logL_addition': condition
                              }
         if self.light_model_list != []:
@@ -19,13 +19,16 @@ def read_pixel_scale(header):
     
     Parameter
     --------
-        header: a fits file header from pyfits.open('filename').
+        header: a fits file header from pyfits.open('filename'), or the WCS already built from it.
         
     Return
     --------
         The pixel scale in arcsec scale.
     """
-    wcs = WCS(header)
+    if isinstance(header, WCS):
+        wcs = header
+    else:
+        wcs = WCS(header)
     diff_RA_DEC = wcs.all_pix2world([0,0],[0,100],1)
     diff_scale = np.sqrt((diff_RA_DEC[0][1]-diff_RA_DEC[0][0])**2 + (diff_RA_DEC[1][1]-diff_RA_DEC[1][0])**2)
     pix_scale = diff_scale * 3600 / 100
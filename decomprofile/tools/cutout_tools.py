@@ -41,6 +41,14 @@ def cutout(image, center, radius):
     --------
         A cutout image stamp, frame size in odd number.
     """
+    image = np.asanyarray(image)
+    #Same bounding box as the region mask. If it is inside the image, slice directly (a view, as the mask cutout returns).
+    xmin = int(np.floor(center[0] - radius + 0.5))
+    xmax = int(np.ceil(center[0] + radius + 0.5))
+    ymin = int(np.floor(center[1] - radius + 0.5))
+    ymax = int(np.ceil(center[1] + radius + 0.5))
+    if image.ndim == 2 and xmin >= 0 and ymin >= 0 and xmax <= image.shape[1] and ymax <= image.shape[0]:
+        return image[ymin:ymax, xmin:xmax]
     region = pix_region(center, radius=radius)
     cut = region.to_mask(mode='exact')
     cut_image = cut.cutout(image)
@@ -105,13 +105,13 @@ def measure_FWHM(image, radius = 10):
     seed_num = 2*radius+1
     frm = len(image)
     q_frm = int(frm/4)
-    x_center = np.where(image == image[q_frm:-q_frm,q_frm:-q_frm].max())[1][0]
-    y_center = np.where(image == image[q_frm:-q_frm,q_frm:-q_frm].max())[0][0]
+    y_center, x_center = np.argwhere(image == image[q_frm:-q_frm,q_frm:-q_frm].max())[0]
     
-    x_n = np.asarray([image[y_center][x_center+i] for i in range(-radius, radius+1)]) # The x value, vertcial 
-    y_n = np.asarray([image[y_center+i][x_center] for i in range(-radius, radius+1)]) # The y value, horizontal 
-    xy_n = np.asarray([image[y_center+i][x_center+i] for i in range(-radius, radius+1)]) # The up right value, horizontal
-    xy__n =  np.asarray([image[y_center-i][x_center+i] for i in range(-radius, radius+1)]) # The up right value, horizontal
+    idx = np.arange(-radius, radius+1)
+    x_n = image[y_center, x_center+idx] # The x value, vertcial 
+    y_n = image[y_center+idx, x_center] # The y value, horizontal 
+    xy_n = image[y_center+idx, x_center+idx] # The up right value, horizontal
+    xy__n = image[y_center-idx, x_center+idx] # The up right value, horizontal
     from astropy.modeling import models, fitting
     g_init = models.Gaussian1D(amplitude=y_n.max(), mean=radius, stddev=1.5)
     fit_g = fitting.LevMarLSQFitter()
@@ -0,0 +1,47 @@
+"""
+Tests for `decomprofile.tools.cutout_tools` module.
+"""
+import numpy as np
+import pytest
+from decomprofile.tools.cutout_tools import cutout, pix_region
+
+
+class TestCutout(object):
+
+    @classmethod
+    def setup_class(cls):
+        cls.image = np.random.RandomState(0).rand(120, 150)
+
+    def _region_cutout(self, center, radius):
+        return pix_region(center, radius=radius).to_mask(mode='exact').cutout(self.image)
+
+    @pytest.mark.parametrize('center', [[60, 70], [60.5, 70.5], [60.5, 70], [3, 4], [149, 119], [10.5, 0.5]])
+    @pytest.mark.parametrize('radius', [5, 10, 12.5, 20])
+    def test_same_as_region_mask(self, center, radius):
+        cut = cutout(self.image, center, radius)
+        region_cut = self._region_cutout(center, radius)
+        assert cut.shape == region_cut.shape
+        np.testing.assert_array_equal(cut, region_cut)
+
+    def test_same_as_region_mask_random(self):
+        rng = np.random.RandomState(1)
+        for i in range(500):
+            center = rng.uniform(-5, 155, 2)
+            radius = rng.uniform(1, 40)
+            region_cut = self._region_cutout(center, radius)
+            if region_cut is None:
+                continue
+            cut = cutout(self.image, center, radius)
+            assert cut.shape == region_cut.shape
+            np.testing.assert_array_equal(cut, region_cut)
+
+    def test_interior_cut_is_odd_box(self):
+        assert cutout(self.image, [60, 70], 10).shape == (21, 21)
+
+    def test_array_like_input(self):
+        cut = cutout([[1., 2, 3], [4, 5, 6], [7, 8, 9]], [1, 1], 1)
+        np.testing.assert_array_equal(cut, [[1., 2, 3], [4, 5, 6], [7, 8, 9]])
+
+    @classmethod
+    def teardown_class(cls):
+        pass
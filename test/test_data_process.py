@@ -0,0 +1,140 @@
+"""
+Tests for `decomprofile.data_process` module.
+"""
+import numpy as np
+from decomprofile.data_process import DataProcess, _parse_ids
+
+
+class TestParseIds(object):
+
+    def test_multi_digit_ids(self):
+        assert _parse_ids('0 2 12', 20) == [0, 2, 12]
+
+    def test_comma_separated(self):
+        assert _parse_ids('1,2, 3', 5) == [1, 2, 3]
+
+    def test_invalid_ids_are_skipped(self):
+        assert _parse_ids('-1 --1 a 7 3', 5) == [3]
+        assert _parse_ids(u'1 \u00b2', 5) == [1]
+
+    def test_empty_input(self):
+        assert _parse_ids('', 5) == []
+
+
+def _gaussian_fov(size=300, center=(150, 150), sigma=2., amp=100.):
+    yy, xx = np.mgrid[:size, :size]
+    star = amp * np.exp(-((xx-center[0])**2 + (yy-center[1])**2)/(2*sigma**2))
+    noise = np.random.RandomState(0).normal(0, 0.1, (size, size))
+    return star + noise
+
+
+class TestCheckout(object):
+
+    @classmethod
+    def setup_class(cls):
+        cls.data_process = DataProcess(fov_image=_gaussian_fov(), target_pos=[150, 150], zp=27.0)
+
+    def _check_box(self, shape, box_size):
+        psf = np.random.RandomState(1).rand(*shape)
+        self.data_process.PSF_list = [psf]
+        self.data_process.checkout()
+        box_psf = self.data_process.PSF_list[0]
+        assert box_psf.shape == (box_size, box_size)
+        assert box_size % 2 == 1
+        np.testing.assert_almost_equal(box_psf.sum(), 1.)
+        assert self.data_process.PSF_stack is None
+        return psf, box_psf
+
+    def test_pad_one_column(self):
+        psf, box_psf = self._check_box((60, 61), 61)
+        np.testing.assert_allclose(box_psf[:60, :], psf/psf.sum())
+
+    def test_pad_to_odd_box(self):
+        psf, box_psf = self._check_box((61, 64), 65)
+        np.testing.assert_allclose(box_psf[2:63, :64], psf/psf.sum())
+
+
+class TestNoiseMap(object):
+
+    def test_scalar_exptime(self):
+        fov_image = _gaussian_fov()
+        data_process = DataProcess(fov_image=fov_image, target_pos=[150, 150], exptime=100., zp=27.0)
+        data_process.generate_target_materials(radius=20, bkg_std=0.1)
+        target_stamp = fov_image[130:171, 130:171]
+        np.testing.assert_array_equal(data_process.target_stamp, target_stamp)
+        np.testing.assert_allclose(data_process.noise_map, np.sqrt(abs(target_stamp/100.) + 0.1**2))
+
+
+class TestDtype(object):
+
+    def test_float32_noise_map(self):
+        data_process = DataProcess(fov_image=_gaussian_fov(), target_pos=[150, 150], exptime=100.,
+                                   zp=27.0, dtype=np.float32)
+        data_process.generate_target_materials(radius=20, bkg_std=0.1)
+        assert data_process.target_stamp.dtype == np.float32
+        assert data_process.noise_map.dtype == np.float32
+
+    def test_float32_fov_noise_map(self):
+        data_process = DataProcess(fov_image=_gaussian_fov(), target_pos=[150, 150], zp=27.0,
+                                   fov_noise_map=np.ones((300, 300)), dtype=np.float32)
+        data_process.generate_target_materials(radius=20, bkg_std=0.1)
+        assert data_process.target_stamp.dtype == np.float32
+        assert data_process.noise_map.dtype == np.float32
+
+    def test_out_of_range_not_cast(self):
+        fov_image = _gaussian_fov()
+        fov_image[150, 150] = 1.e38
+        data_process = DataProcess(fov_image=fov_image, target_pos=[150, 150], exptime=100.,
+                                   zp=27.0, dtype=np.float32)
+        data_process.generate_target_materials(radius=20, bkg_std=0.1)
+        assert data_process.target_stamp.dtype == np.float64
+        assert data_process.target_stamp[20, 20] == 1.e38
+
+
+class TestFovImagePath(object):
+
+    def test_load_from_fits(self, tmp_path):
+        import astropy.io.fits as pyfits
+        fov_image = _gaussian_fov()
+        hdu = pyfits.PrimaryHDU(fov_image)
+        hdu.header['EXPTIME'] = 500.
+        fov_image_path = str(tmp_path / 'fov.fits')
+        hdu.writeto(fov_image_path)
+        data_process = DataProcess(fov_image_path=fov_image_path, target_pos=[150, 150], zp=27.0)
+        assert data_process._exptime_header == 500.
+        data_process.generate_target_materials(radius=20, bkg_std=0.1)
+        target_stamp = fov_image[130:171, 130:171]
+        np.testing.assert_array_equal(data_process.target_stamp, target_stamp)
+        np.testing.assert_allclose(data_process.noise_map, np.sqrt(abs(target_stamp/500.) + 0.1**2))
+
+
+class TestFindPSF(object):
+
+    @classmethod
+    def setup_class(cls):
+        from astropy.wcs import WCS
+        wcs = WCS(naxis=2)
+        wcs.wcs.ctype = ['RA---TAN', 'DEC--TAN']
+        wcs.wcs.crpix = [100., 100.]
+        wcs.wcs.crval = [150., 2.]
+        wcs.wcs.cdelt = [-0.06/3600, 0.06/3600]
+        cls.header = wcs.to_header()
+        #Sky positions of the numpy pixels where the stars are drawn, with a sub-pixel offset.
+        cls.sky_pos = wcs.all_pix2world([[150.3, 149.8], [79.6, 200.4]], 0)
+        fov_image = _gaussian_fov() + _gaussian_fov(center=(80, 200))  #Two stars.
+        cls.data_process = DataProcess(fov_image=fov_image, target_pos=[150, 150],
+                                       header=cls.header, zp=27.0)
+
+    def test_wcs_positions(self):
+        self.data_process.find_PSF(radius=20, PSF_pos_list=self.sky_pos, pos_type='wcs')
+        np.testing.assert_array_equal(self.data_process.PSF_pos_list, [[150, 150], [80, 200]])
+        assert self.data_process.PSF_stack.shape == (2, 41, 41)
+
+    def test_wcs_target_pos(self):
+        data_process = DataProcess(fov_image=self.data_process.fov_image, target_pos=self.sky_pos[1],
+                                   pos_type='wcs', header=self.header, zp=27.0)
+        np.testing.assert_array_equal(data_process.target_pos, [80, 200])
+
+    def test_float_radius(self):
+        self.data_process.find_PSF(radius=20.0, PSF_pos_list=[[150, 150]])
+        assert self.data_process.PSF_list[0].shape == (41, 41)